@@ -2,6 +2,7 @@ from abc import ABC, abstractmethod
 from argparse import ArgumentParser, Namespace
 from collections.abc import Callable
 from enum import StrEnum
+from functools import cache
 from typing import Any, ClassVar, Self, get_origin, get_type_hints
 
 from notte_browser.session import NotteSessionConfig
@@ -10,6 +11,14 @@ from notte_core.llms.engine import LlmModel
 from notte_sdk.types import DEFAULT_MAX_NB_STEPS
 from pydantic import Field, model_validator
 
+# maps python types to argparse types
+_ARG_TYPES: dict[Any, type] = {
+    str: str,
+    int: int,
+    float: float,
+    bool: bool,
+}
+
 
 class RaiseCondition(StrEnum):
     """How to raise an error when the agent fails to complete a step.
@@ -71,9 +80,20 @@ class AgentConfig(FrozenConfig, ABC):
                 del values["force_session"]
                 return values
             raise ValueError("Session should not be set by the user. Set `default_session` instead.")
-        values["session"] = cls.default_session()  # Set the session field using the subclass's method
+        values["session"] = cls._default_session()  # Set the session field using the subclass's method
         return values
 
+    @classmethod
+    @cache
+    def _default_session(cls) -> NotteSessionConfig:
+        # session configs are frozen, so the default one can be shared across instances
+        return cls.default_session()
+
+    @classmethod
+    @cache
+    def _type_hints(cls) -> dict[str, Any]:
+        return get_type_hints(cls)
+
     def groq(self: Self, deep: bool = True) -> Self:
         return self.model(LlmModel.groq, deep=deep)
 
@@ -115,13 +135,7 @@ class AgentConfig(FrozenConfig, ABC):
     @staticmethod
     def _get_arg_type(python_type: Any) -> Any:
         """Maps Python types to argparse types."""
-        type_map = {
-            str: str,
-            int: int,
-            float: float,
-            bool: bool,
-        }
-        return type_map.get(python_type, str)
+        return _ARG_TYPES.get(python_type, str)
 
     @staticmethod
     def create_base_parser() -> ArgumentParser:
@@ -152,11 +166,11 @@ class AgentConfig(FrozenConfig, ABC):
         return parser
 
     @classmethod
-    def create_parser(cls) -> ArgumentParser:
-        """Creates an ArgumentParser with all the fields from the config."""
-        parser = cls.create_base_parser()
-        hints = get_type_hints(cls)
-
+    @cache
+    def _parser_arguments(cls) -> tuple[tuple[str, dict[str, Any]], ...]:
+        """Computes the argparse arguments of the config fields once per class."""
+        hints = cls._type_hints()
+        arguments: list[tuple[str, dict[str, Any]]] = []
         for field_name, field_info in cls.model_fields.items():
             if field_name == "session":
                 continue
@@ -166,15 +180,21 @@ class AgentConfig(FrozenConfig, ABC):
 
             default = field_info.default
             help_text = field_info.description or "no description available"
-            arg_type = cls._get_arg_type(field_type)
-
-            _ = parser.add_argument(
-                f"--{field_name.replace('_', '-')}",
-                type=arg_type,
-                default=default,
-                help=f"{help_text} (default: {default})",
+            arguments.append(
+                (
+                    f"--{field_name.replace('_', '-')}",
+                    dict(type=cls._get_arg_type(field_type), default=default, help=f"{help_text} (default: {default})"),
+                )
             )
+        return tuple(arguments)
 
+    @classmethod
+    def create_parser(cls) -> ArgumentParser:
+        """Creates an ArgumentParser with all the fields from the config."""
+        # callers add their own arguments to the parser: build a new one from the cached arguments
+        parser = cls.create_base_parser()
+        for flag, kwargs in cls._parser_arguments():
+            _ = parser.add_argument(flag, **kwargs)
         return parser
 
     @classmethod
@@ -185,35 +205,29 @@ class AgentConfig(FrozenConfig, ABC):
         """
         disallowed_args = ["task", "session.window.headless"]
 
-        session_args = {
-            k.replace("session.", "").replace("-", "_"): v
-            for k, v in vars(args).items()
-            if k.startswith("session.") and k not in disallowed_args
-        }
-        agent_args = {
-            k.replace("-", "_"): v
-            for k, v in vars(args).items()
-            if not k.startswith("session.") and k not in disallowed_args
-        }
+        # split session and agent arguments in a single pass
+        session_args: dict[str, Any] = {}
+        agent_args: dict[str, Any] = {}
+        for k, v in vars(args).items():
+            if k in disallowed_args:
+                continue
+            if k.startswith("session."):
+                session_args[k.removeprefix("session.").replace("-", "_")] = v
+            else:
+                agent_args[k.replace("-", "_")] = v
+
+        # window options are applied together with the other session options, i.e with a single copy
+        window_args: dict[str, Any] = {}
+        if DefaultAgentArgs.SESSION_HEADLESS in session_args:
+            window_args["headless"] = session_args.pop(DefaultAgentArgs.SESSION_HEADLESS)
+        if DefaultAgentArgs.SESSION_DISABLE_WEB_SECURITY in session_args:
+            window_args["web_security"] = not session_args.pop(DefaultAgentArgs.SESSION_DISABLE_WEB_SECURITY)
 
         def update_session(session: NotteSessionConfig) -> NotteSessionConfig:
-            operations: list[Callable[[NotteSessionConfig], NotteSessionConfig]] = []
-            if DefaultAgentArgs.SESSION_HEADLESS in session_args:
-                headless = session_args[DefaultAgentArgs.SESSION_HEADLESS]
-                operations.append(lambda session: session.headless(headless))
-                del session_args[DefaultAgentArgs.SESSION_HEADLESS]
-            if DefaultAgentArgs.SESSION_DISABLE_WEB_SECURITY in session_args:
-                disable_web_security = session_args[DefaultAgentArgs.SESSION_DISABLE_WEB_SECURITY]
-                operations.append(
-                    lambda session: session.disable_web_security()
-                    if disable_web_security
-                    else session.enable_web_security()
+            if len(window_args) > 0:
+                return session._copy_and_validate(
+                    **session_args, window=session.window._copy_and_validate(**window_args)
                 )
-                del session_args[DefaultAgentArgs.SESSION_DISABLE_WEB_SECURITY]
-
-            session = session._copy_and_validate(**session_args)
-            for operation in operations:
-                session = operation(session)
-            return session
+            return session._copy_and_validate(**session_args)
 
         return cls(**agent_args).map_session(update_session)
@@ -1,7 +1,10 @@
 import base64
 import json
+from bisect import bisect_left
 from dataclasses import dataclass, field
-from typing import TypeVar
+from functools import cache
+from itertools import accumulate
+from typing import Any, TypeVar
 
 from litellm import (
     AllMessageValues,
@@ -15,13 +18,25 @@ from litellm import (
     ModelResponse,  # type: ignore[reportPrivateImportUsage]
     OpenAIMessageContent,
 )
-from litellm.utils import token_counter  # type: ignore[reportUnknownVariableType]
+from litellm.utils import token_counter
 from loguru import logger
 from notte_core.errors.llm import LLMParsingError
 from notte_core.llms.engine import LlmModel, StructuredContent
 from pydantic import BaseModel
 
-# Define valid message roles
+try:
+    from litellm.utils import _select_tokenizer  # type: ignore[reportPrivateUsage, reportUnknownVariableType]
+except ImportError:
+    # private litellm helper: without it, `token_counter` resolves the tokenizer on every call
+    _select_tokenizer = None  # type: ignore[reportConstantRedefinition, reportAssignmentType]
+
+
+@cache
+def _tokenizer_for(model: str) -> dict[str, Any] | None:
+    """Resolve the tokenizer of a model once and share it across all conversations"""
+    if _select_tokenizer is None:
+        return None
+    return _select_tokenizer(model)  # type: ignore[reportReturnType]
 
 
 @dataclass
@@ -67,16 +82,25 @@ class Conversation:
 
     def count_tokens(self, content: AllMessageValues) -> int:
         """Count the number of tokens in a list of messages"""
-        return token_counter(model=self.model, messages=[content])
+        return token_counter(model=self.model, custom_tokenizer=_tokenizer_for(self.model), messages=[content])
 
     def total_tokens(self) -> int:
         """Get total tokens in conversation history"""
         return self._total_tokens
 
-    def trim_history_to_fit(self, new_content: AllMessageValues) -> None:
+    def trim_history_to_fit(
+        self,
+        new_content: AllMessageValues | None = None,
+        new_content_tokens: int | None = None,
+    ) -> None:
         """Trim history to make room for new content while preserving system messages"""
         if not self.autosize:
             return
+        if new_content_tokens is None:
+            new_content_tokens = self.count_tokens(new_content) if new_content is not None else 0
+        # the running total is kept up to date: nothing to trim if everything already fits
+        if self._total_tokens + new_content_tokens <= self.conservative_max_tokens:
+            return
 
         # Always keep system messages
         init_messages: list[CachedMessage] = []
@@ -93,35 +117,42 @@ class Conversation:
                 case _, _:
                     other_messages.append(msg)
 
-        new_content_tokens = self.count_tokens(new_content)
         init_tokens = sum(msg.token_count for msg in init_messages)
         available_tokens = self.conservative_max_tokens - init_tokens - new_content_tokens
 
-        # Remove oldest non-system messages until we have room
-        current_tokens = sum(msg.token_count for msg in other_messages)
+        # Remove oldest non-system messages until we have room, i.e find the shortest prefix
+        # of messages whose removal frees enough tokens
+        prefix_tokens = list(accumulate(msg.token_count for msg in other_messages))
+        current_tokens = prefix_tokens[-1] if prefix_tokens else 0
         has_trimmed = 0
-        while other_messages and current_tokens > available_tokens:
-            removed = other_messages.pop(0)
-            current_tokens -= removed.token_count
-            has_trimmed += 1
+        if other_messages and current_tokens > available_tokens:
+            has_trimmed = min(bisect_left(prefix_tokens, current_tokens - available_tokens) + 1, len(other_messages))
+            current_tokens -= prefix_tokens[has_trimmed - 1]
 
         if has_trimmed > 0:
             logger.info(
                 f"Trimmed {has_trimmed} message(s) to stay under max token limit (i.e {self.default_max_tokens // 1000}k)"
             )
 
-        self.history = init_messages + other_messages
-        self._total_tokens = sum(msg.token_count for msg in self.history)
+        self.history = init_messages + other_messages[has_trimmed:]
+        self._total_tokens = init_tokens + current_tokens
 
     def _add_message(self, msg: AllMessageValues) -> None:
         """Internal helper to add a message with token counting"""
         token_count = self.count_tokens(msg)
         if self.autosize:
-            self.trim_history_to_fit(msg)
+            self.trim_history_to_fit(msg, new_content_tokens=token_count)
         cached_msg = CachedMessage(message=msg, token_count=token_count)
         self.history.append(cached_msg)
         self._total_tokens += token_count
 
+    def add_cached_messages(self, messages: list[CachedMessage]) -> None:
+        """Add already tokenized messages to the conversation, trimming the history only once"""
+        self.history.extend(messages)
+        self._total_tokens += sum(msg.token_count for msg in messages)
+        if self.autosize:
+            self.trim_history_to_fit()
+
     def add_system_message(self, content: str) -> None:
         """Add a system message to the conversation"""
         self._add_message(ChatCompletionSystemMessage(role="system", content=content))
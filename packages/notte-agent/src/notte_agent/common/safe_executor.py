@@ -12,10 +12,13 @@ T = TypeVar("T")  # Target type
 
 
 class ExecutionStatus(BaseModel, Generic[S, T]):
+    model_config = {"frozen": True}  # pyright: ignore[reportUnannotatedClassAttribute]
+
     input: S
     output: T | None
     success: bool
-    message: str
+    # only failures need a message, successful executions leave it empty
+    message: str = ""
     should_rerun_step_agent: bool = False
 
     def get(self) -> T:
@@ -34,9 +37,11 @@ class StepExecutionFailure(NotteBaseError):
 
 
 class MaxConsecutiveFailuresError(NotteBaseError):
+    MESSAGE_TEMPLATE: str = "Max consecutive failures reached in a single step: {max_failures}."
+
     def __init__(self, max_failures: int):
         self.max_failures: int = max_failures
-        message = f"Max consecutive failures reached in a single step: {max_failures}."
+        message = self.MESSAGE_TEMPLATE.format(max_failures=max_failures)
         super().__init__(
             user_message=message,
             agent_message=message,
@@ -63,9 +68,10 @@ class SafeActionExecutor(Generic[S, T]):
         self.consecutive_failures = 0
 
     def on_failure(self, input_data: S, error_msg: str, e: Exception) -> ExecutionStatus[S, T]:
-        self.consecutive_failures += 1
+        consecutive_failures = self.consecutive_failures + 1
+        self.consecutive_failures = consecutive_failures
 
-        if self.consecutive_failures >= self.max_consecutive_failures:
+        if consecutive_failures >= self.max_consecutive_failures:
             raise MaxConsecutiveFailuresError(self.max_consecutive_failures) from e
         if self.raise_on_failure:
             raise StepExecutionFailure(error_msg) from e
@@ -74,7 +80,7 @@ class SafeActionExecutor(Generic[S, T]):
             output=None,
             success=False,
             message=error_msg,
-            should_rerun_step_agent=True if self.consecutive_failures <= self.max_consecutive_failures else False,
+            should_rerun_step_agent=consecutive_failures <= self.max_consecutive_failures,
         )
 
     async def execute(self, input_data: S) -> ExecutionStatus[S, T]:
@@ -83,11 +89,11 @@ class SafeActionExecutor(Generic[S, T]):
                 self.precheck_func(input_data)
             result = await self.func(input_data)
             self.consecutive_failures = 0
-            return ExecutionStatus(
+            # inputs and outputs are trusted on success: skip pydantic validation
+            return ExecutionStatus.model_construct(
                 input=input_data,
                 success=True,
                 output=result,
-                message=f"Successfully executed action with input: {input_data}",
             )
         except RateLimitError as e:
             return self.on_failure(input_data, "Rate limit reached. Waiting before retry.", e)
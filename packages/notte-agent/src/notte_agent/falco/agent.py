@@ -1,8 +1,11 @@
+import asyncio
 import time
 import traceback
 import typing
 from collections.abc import Callable
+from dataclasses import dataclass
 from enum import StrEnum
+from functools import cached_property
 
 import notte_core
 from litellm import AllMessageValues, override
@@ -31,8 +34,9 @@ from patchright.async_api import Locator
 from notte_agent.common.base import BaseAgent
 from notte_agent.common.captcha_detector import CaptchaDetector
 from notte_agent.common.config import AgentConfig, RaiseCondition
-from notte_agent.common.conversation import Conversation
+from notte_agent.common.conversation import CachedMessage, Conversation
 from notte_agent.common.safe_executor import ExecutionStatus, SafeActionExecutor
+from notte_agent.common.trajectory_history import TrajectoryStep
 from notte_agent.common.types import AgentResponse
 from notte_agent.common.validator import CompletionValidator
 
@@ -49,7 +53,6 @@ from notte_agent.falco.types import StepAgentOutput
 # Setup telemetry
 # Setup memory
 # Handle custom functions, e.g. `Upload file to element`ç
-# Remove base 64 images from current state
 # TODO: add fault tolerance LLM parsing
 # TODO: only display modal actions when modal is open (same as before)
 # TODO: handle prevent default click JS events
@@ -75,6 +78,19 @@ class FalcoAgentConfig(AgentConfig):
         return NotteSessionConfig().disable_perception()
 
 
+@dataclass
+class StepMessages:
+    """Rendered conversation messages of a trajectory step, along with what they were rendered from"""
+
+    step: TrajectoryStep[StepAgentOutput]
+    nb_results: int
+    with_screenshot: bool
+    messages: list[CachedMessage]
+
+    def is_valid(self, step: TrajectoryStep[StepAgentOutput], with_screenshot: bool) -> bool:
+        return self.step is step and self.nb_results == len(step.results) and self.with_screenshot == with_screenshot
+
+
 class FalcoAgent(BaseAgent):
     def __init__(
         self,
@@ -106,9 +122,6 @@ class FalcoAgent(BaseAgent):
             )
 
         self.perception: FalcoPerception = FalcoPerception()
-        self.validator: CompletionValidator = CompletionValidator(llm=self.llm, perception=self.perception)
-        self.captcha_detector: CaptchaDetector = CaptchaDetector(llm=self.llm, perception=self.perception)
-        self.prompt: FalcoPrompt = FalcoPrompt(max_actions_per_step=config.max_actions_per_step)
         self.conv: Conversation = Conversation(
             max_tokens=config.max_history_tokens,
             convert_tools_to_assistant=True,
@@ -117,11 +130,13 @@ class FalcoAgent(BaseAgent):
         )
         self.history_type: HistoryType = config.history_type
         self.trajectory: FalcoTrajectoryHistory = FalcoTrajectoryHistory(max_error_length=config.max_error_length)
+        # rendered & tokenized conversation messages of each trajectory step
+        self._steps_messages: list[StepMessages] = []
 
         def precheck_action(action: BaseAction):
             last_obs = self.trajectory.last_obs()
             if not self.is_first_step() and last_obs is not None:
-                valid_action_set = last_obs.valid_action_set()
+                valid_action_set = last_obs.valid_action_set
                 if action.id not in valid_action_set:
                     raise InvalidActionError(action.id, available_actions=list(valid_action_set))
 
@@ -150,14 +165,35 @@ class FalcoAgent(BaseAgent):
             max_consecutive_failures=config.max_consecutive_failures,
         )
 
+    # prompt files, validator and captcha detector are only needed once the agent runs:
+    # defer them so that agents created speculatively stay cheap to instantiate
+
+    @cached_property
+    def prompt(self) -> FalcoPrompt:
+        return FalcoPrompt(max_actions_per_step=self.config.max_actions_per_step)
+
+    @cached_property
+    def validator(self) -> CompletionValidator:
+        return CompletionValidator(llm=self.llm, perception=self.perception)
+
+    @cached_property
+    def captcha_detector(self) -> CaptchaDetector:
+        return CaptchaDetector(llm=self.llm, perception=self.perception)
+
     @staticmethod
     async def compute_locator_attributes(locator: Locator) -> LocatorAttributes:
-        attr_type = await locator.get_attribute("type")
-        autocomplete = await locator.get_attribute("autocomplete")
-        outer_html = await locator.evaluate("el => el.outerHTML")
-        return LocatorAttributes(type=attr_type, autocomplete=autocomplete, outerHTML=outer_html)
+        # fetch all attributes in a single browser roundtrip
+        attrs: dict[str, str | None] = await locator.evaluate(
+            """el => ({
+                type: el.getAttribute("type"),
+                autocomplete: el.getAttribute("autocomplete"),
+                outerHTML: el.outerHTML,
+            })"""
+        )
+        return LocatorAttributes.model_validate(attrs)
 
     async def reset(self) -> None:
+        self._steps_messages.clear()
         self.conv.reset()
         self.trajectory.reset()
         self.step_executor.reset()
@@ -181,10 +217,13 @@ class FalcoAgent(BaseAgent):
             system_msg += "\n" + self.vault.instructions()
         self.conv.add_system_message(content=system_msg)
         self.conv.add_user_message(content=task_msg)
-        # just for logging
-        traj_msg = self.trajectory.perceive()
+        # the full trajectory is rebuilt from all steps: only perceive it when it is used
+        traj_msg = (
+            self.trajectory.perceive() if self.config.verbose or self.history_type is HistoryType.COMPRESSED else ""
+        )
         if self.config.verbose:
             logger.info(f"🔍 Trajectory history:\n{traj_msg}")
+        last_valid_obs = self.trajectory.last_obs()
         # add trajectory to the conversation
         match self.history_type:
             case HistoryType.COMPRESSED:
@@ -192,33 +231,16 @@ class FalcoAgent(BaseAgent):
             case _:
                 if len(self.trajectory.steps) == 0:
                     self.conv.add_user_message(content=self.trajectory.start_rules())
-                for step in self.trajectory.steps:
-                    # TODO: choose if we want this to be an assistant message or a tool message
-                    # self.conv.add_tool_message(step.agent_response, tool_id="step")
-                    self.conv.add_assistant_message(step.agent_response.model_dump_json(exclude_none=True))
-                    for result in step.results:
-                        short_step_msg = self.trajectory.perceive_step_result(result, include_ids=True)
-                        self.conv.add_user_message(content=short_step_msg)
-                        if not result.success:
-                            continue
-                        # add observation data to the conversation
-                        obs = result.get()
-                        match (self.history_type, obs.has_data()):
-                            case (HistoryType.FULL_CONVERSATION, _):
-                                self.conv.add_user_message(
-                                    content=self.perception.perceive(obs),
-                                    image=(obs.screenshot if self.config.include_screenshot else None),
-                                )
-                            case (HistoryType.SHORT_OBSERVATIONS_WITH_RAW_DATA, True):
-                                # add data if data was scraped
-                                self.conv.add_user_message(content=self.perception.perceive_data(obs, raw=True))
-
-                            case (HistoryType.SHORT_OBSERVATIONS_WITH_SHORT_DATA, True):
-                                self.conv.add_user_message(content=self.perception.perceive_data(obs, raw=False))
-                            case _:
-                                pass
+                self.conv.add_cached_messages(
+                    [
+                        msg
+                        for step_idx, step in enumerate(self.trajectory.steps)
+                        for msg in self.get_step_messages(
+                            step_idx, step, last_valid_obs if self.config.include_screenshot else None
+                        )
+                    ]
+                )
 
-        last_valid_obs = self.trajectory.last_obs()
         if last_valid_obs is not None and self.history_type is not HistoryType.FULL_CONVERSATION:
             self.conv.add_user_message(
                 content=self.perception.perceive(last_valid_obs),
@@ -230,10 +252,64 @@ class FalcoAgent(BaseAgent):
 
         return self.conv.messages()
 
-    async def step(self, task: str) -> CompletionAction | None:
-        """Execute a single step of the agent"""
-        messages = await self.get_messages(task)
-        response: StepAgentOutput = self.llm.structured_completion(messages, response_format=StepAgentOutput)
+    def get_step_messages(
+        self,
+        step_idx: int,
+        step: TrajectoryStep[StepAgentOutput],
+        screenshot_obs: Observation | None = None,
+    ) -> list[CachedMessage]:
+        """Render the conversation messages of a trajectory step, reusing them until the step changes
+
+        Only the screenshot of `screenshot_obs` (i.e the latest observation) is attached: screenshots of
+        older observations are dropped from the conversation to save tokens.
+        """
+        with_screenshot = screenshot_obs is not None and any(obs is screenshot_obs for obs in step.observations())
+        if step_idx < len(self._steps_messages):
+            cached = self._steps_messages[step_idx]
+            if cached.is_valid(step, with_screenshot):
+                return cached.messages
+
+        conv = Conversation(convert_tools_to_assistant=True, model=self.config.reasoning_model)
+        # TODO: choose if we want this to be an assistant message or a tool message
+        # conv.add_tool_message(step.agent_response, tool_id="step")
+        conv.add_assistant_message(step.agent_response.model_dump_json(exclude_none=True))
+        for result in step.results:
+            short_step_msg = self.trajectory.perceive_step_result(result, include_ids=True)
+            conv.add_user_message(content=short_step_msg)
+            if not result.success:
+                continue
+            # add observation data to the conversation
+            obs = result.get()
+            match (self.history_type, obs.has_data()):
+                case (HistoryType.FULL_CONVERSATION, _):
+                    conv.add_user_message(
+                        content=self.perception.perceive(obs),
+                        image=(obs.screenshot if obs is screenshot_obs else None),
+                    )
+                case (HistoryType.SHORT_OBSERVATIONS_WITH_RAW_DATA, True):
+                    # add data if data was scraped
+                    conv.add_user_message(content=self.perception.perceive_data(obs, raw=True))
+
+                case (HistoryType.SHORT_OBSERVATIONS_WITH_SHORT_DATA, True):
+                    conv.add_user_message(content=self.perception.perceive_data(obs, raw=False))
+                case _:
+                    pass
+
+        entry = StepMessages(
+            step=step, nb_results=len(step.results), with_screenshot=with_screenshot, messages=conv.history
+        )
+        if step_idx < len(self._steps_messages):
+            self._steps_messages[step_idx] = entry
+        else:
+            self._steps_messages.append(entry)
+        return conv.history
+
+    async def predict(self, task: str, messages: list[AllMessageValues]) -> StepAgentOutput:
+        """Query the reasoning model for the next actions to execute"""
+        # litellm completions are blocking: run them in a thread to keep the event loop (i.e browser) responsive
+        response: StepAgentOutput = await asyncio.to_thread(
+            self.llm.structured_completion, messages, response_format=StepAgentOutput
+        )
         if self.step_callback is not None:
             self.step_callback(task, response)
 
@@ -242,20 +318,18 @@ class FalcoAgent(BaseAgent):
 
         for line in response.pretty_string().split("\n"):
             logger.opt(colors=True).info(line)
+        return response
+
+    async def execute_actions(self, response: StepAgentOutput) -> str | None:
+        """Execute the actions of the agent response
 
-        self.trajectory.add_output(response)
-        # check for completion
-        if response.output is not None:
-            return response.output
-        # Execute the actions
+        Returns the error message to feed back to the llm if the step should be rerun, None otherwise.
+        """
         for action in response.get_actions(self.config.max_actions_per_step):
             result = await self.step_executor.execute(action)
 
             if result.should_rerun_step_agent:
-                logger.warning("Wrong action id, checking available actions")
-                # feedback error to the llm
-                self.conv.add_user_message(content=result.message)
-                return await self.step(task)
+                return result.message
 
             self.trajectory.add_step(result)
             step_msg = self.trajectory.perceive_step_result(result, include_ids=True)
@@ -280,6 +354,32 @@ class FalcoAgent(BaseAgent):
             # Successfully executed the action
         return None
 
+    async def step(self, task: str) -> CompletionAction | None:
+        """Execute a single step of the agent"""
+        messages = await self.get_messages(task)
+        for _ in range(self.config.max_retry_action_errors + 1):
+            response = await self.predict(task, messages)
+            self.trajectory.add_output(response)
+            # check for completion
+            if response.output is not None:
+                return response.output
+            # Execute the actions
+            rerun_message = await self.execute_actions(response)
+            if rerun_message is None:
+                return None
+            logger.warning("Wrong action id, checking available actions")
+            if len(self.trajectory.steps[-1].results) > 0:
+                # some actions were executed before the failing one: rebuild the conversation from the trajectory
+                _ = await self.get_messages(task)
+            else:
+                # nothing was executed: retry from the current conversation instead of rebuilding it
+                self.conv.add_assistant_message(response.model_dump_json(exclude_none=True))
+            # feedback error to the llm
+            self.conv.add_user_message(content=rerun_message)
+            messages = self.conv.messages()
+        logger.error(f"🚨 Step failed after {self.config.max_retry_action_errors} retries")
+        return None
+
     @override
     async def run(self, task: str, url: str | None = None) -> AgentResponse:
         logger.info(f"Running task: {task}")
@@ -339,7 +439,7 @@ class FalcoAgent(BaseAgent):
                 # Sucessful execution and LLM output is not None
                 # Need to validate the output
                 logger.info(f"🔥 Validating agent output:\n{output.model_dump_json()}")
-                val = self.validator.validate(task, output, self.session.trajectory[-1])
+                val = await asyncio.to_thread(self.validator.validate, task, output, self.session.trajectory[-1])
                 if val.is_valid:
                     logger.info("✅ Task completed successfully")
                     return self.output(output.answer, output.success)
@@ -363,4 +463,6 @@ class FalcoAgent(BaseAgent):
         return self.output(error_msg, False)
 
     def is_first_step(self) -> bool:
+        # `step` records the agent output before executing its actions,
+        # so the first step already holds one entry when actions are prechecked
         return len(self.trajectory.steps) == 1
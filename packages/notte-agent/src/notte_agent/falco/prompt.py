@@ -3,6 +3,7 @@ from enum import StrEnum
 from pathlib import Path
 
 import chevron
+from chevron.tokenizer import tokenize
 from notte_core.controller.actions import (
     BaseAction,
     ClickAction,
@@ -39,6 +40,20 @@ class FalcoPrompt:
         self.system_prompt: str = prompt_type.prompt_file().read_text()
         self.max_actions_per_step: int = max_actions_per_step
         self.space: ActionSpace = ActionSpace(description="", exclude_actions={FallbackObserveAction})
+        # only the timestamp changes between calls to `system`: tokenize the template
+        # and render the static variables once
+        self._system_tokens: list[tuple[str, str]] = list(tokenize(self.system_prompt))
+        self._system_variables: dict[str, str | int] = {
+            "max_actions_per_step": self.max_actions_per_step,
+            "action_description": self.space.markdown(),
+            "example_form_filling": self.example_form_filling(),
+            "example_step": self.example_step(),
+            "completion_example": self.completion_example(),
+            "completion_action_name": CompletionAction.name(),
+            "goto_action_name": GotoAction.name(),
+            "example_navigation_and_extraction": self.example_navigation_and_extraction(),
+            "example_invalid_sequence": self.example_invalid_sequence(),
+        }
 
     @staticmethod
     def _json_dump(steps: list[BaseAction]) -> str:
@@ -97,18 +112,10 @@ class FalcoPrompt:
 
     def system(self) -> str:
         return chevron.render(
-            self.system_prompt,
+            self._system_tokens,
             {
                 "timstamp": dt.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                "max_actions_per_step": self.max_actions_per_step,
-                "action_description": self.space.markdown(),
-                "example_form_filling": self.example_form_filling(),
-                "example_step": self.example_step(),
-                "completion_example": self.completion_example(),
-                "completion_action_name": CompletionAction.name(),
-                "goto_action_name": GotoAction.name(),
-                "example_navigation_and_extraction": self.example_navigation_and_extraction(),
-                "example_invalid_sequence": self.example_invalid_sequence(),
+                **self._system_variables,
             },
         )
 
@@ -99,17 +99,21 @@ class WindowManager(PlaywrightManager):
             return await self.connect_cdp_browser(options)
 
         if self.verbose:
-            if options.debug_port is not None:
-                logger.info(f"[Browser Settings] Launching browser in debug mode on port {options.debug_port}")
-            if options.cdp_url is not None:
-                logger.info(f"[Browser Settings] Connecting to browser over CDP at {options.cdp_url}")
-            if options.proxy is not None:
-                logger.info(f"[Browser Settings] Using proxy {options.proxy.server}")
-            if options.browser_type == BrowserType.FIREFOX:
-                logger.info(
-                    f"[Browser Settings] Using {options.browser_type} browser. Note that CDP may not be supported for this browser."
-                )
+            settings = {
+                "browser_type": options.browser_type.value,
+                "debug_port": options.debug_port,
+                "proxy": options.proxy.server if options.proxy is not None else None,
+            }
+            cdp_note = (
+                " (CDP may not be supported for this browser)" if options.browser_type == BrowserType.FIREFOX else ""
+            )
+            logger.info(
+                "[Browser Settings] Launching browser with "
+                + ", ".join(f"{key}={value}" for key, value in settings.items() if value is not None)
+                + cdp_note
+            )
 
+        proxy = options.proxy.to_playwright() if options.proxy is not None else None
         match options.browser_type:
             case BrowserType.CHROMIUM | BrowserType.CHROME:
                 if options.headless and options.user_agent is None:
@@ -120,14 +124,14 @@ class WindowManager(PlaywrightManager):
                 browser = await self.playwright.chromium.launch(
                     channel="chrome" if options.browser_type == BrowserType.CHROME else None,
                     headless=options.headless,
-                    proxy=options.proxy.to_playwright() if options.proxy is not None else None,
+                    proxy=proxy,
                     timeout=self.BROWSER_CREATION_TIMEOUT_SECONDS * 1000,
                     args=options.get_chrome_args(),
                 )
             case BrowserType.FIREFOX:
                 browser = await self.playwright.firefox.launch(
                     headless=options.headless,
-                    proxy=options.proxy.to_playwright() if options.proxy is not None else None,
+                    proxy=proxy,
                     timeout=self.BROWSER_CREATION_TIMEOUT_SECONDS * 1000,
                 )
         self.browser = browser
@@ -140,24 +144,27 @@ class WindowManager(PlaywrightManager):
         try:
             async with asyncio.timeout(self.BROWSER_OPERATION_TIMEOUT_SECONDS):
                 await _browser.close()
-                return True
+            return True
         except Exception as e:
             logger.error(f"Failed to close window: {e}")
-        self.browser = None
-        return False
+            return False
+        finally:
+            # always release the reference, even on timeout, so that a new browser gets created next time
+            if _browser is self.browser:
+                self.browser = None
 
     @override
     async def get_browser_resource(self, options: BrowserWindowOptions) -> BrowserResource:
         if self.browser is None:
             self.browser = await self.create_playwright_browser(options)
+        viewport = None
+        if options.viewport_width is not None or options.viewport_height is not None:
+            viewport = {
+                "width": options.viewport_width,
+                "height": options.viewport_height,
+            }
+        proxy = options.proxy.to_playwright() if options.proxy is not None else None
         async with asyncio.timeout(self.BROWSER_OPERATION_TIMEOUT_SECONDS):
-            viewport = None
-            if options.viewport_width is not None or options.viewport_height is not None:
-                viewport = {
-                    "width": options.viewport_width,
-                    "height": options.viewport_height,
-                }
-
             context: BrowserContext = await self.browser.new_context(
                 # no viewport should be False for headless browsers
                 no_viewport=not options.headless,
@@ -166,7 +173,7 @@ class WindowManager(PlaywrightManager):
                     "clipboard-read",
                     "clipboard-write",
                 ],  # Needed for clipboard copy/paste to respect tabs / new lines
-                proxy=options.proxy.to_playwright() if options.proxy is not None else None,
+                proxy=proxy,
                 user_agent=options.user_agent,
             )
 
@@ -188,12 +195,17 @@ class WindowManager(PlaywrightManager):
 class GlobalWindowManager:
     manager: WindowManager = WindowManager()
     started: bool = False
+    options: BrowserWindowOptions | None = None
 
     @staticmethod
     async def new_window(options: BrowserWindowOptions) -> BrowserWindow:
-        await GlobalWindowManager.manager.stop()
-        await GlobalWindowManager.manager.start()
-        GlobalWindowManager.started = True
+        """Create a new window, reusing the running browser only if it was launched with the same options"""
+        if not GlobalWindowManager.started or GlobalWindowManager.options != options:
+            await GlobalWindowManager.manager.stop()
+            GlobalWindowManager.manager.browser = None
+            await GlobalWindowManager.manager.start()
+            GlobalWindowManager.started = True
+            GlobalWindowManager.options = options
         return await GlobalWindowManager.manager.new_window(options)
 
     @staticmethod
@@ -207,3 +219,4 @@ class GlobalWindowManager:
             await GlobalWindowManager.manager.stop()
         GlobalWindowManager.manager.browser = None
         GlobalWindowManager.started = False
+        GlobalWindowManager.options = None
@@ -47,7 +47,8 @@ class BrowserWindowOptions(FrozenConfig):
     custom_devtools_frontend: str | None = None
 
     def get_chrome_args(self) -> list[str]:
-        chrome_args = self.chrome_args or []
+        # copy to avoid extending the (shared) config list in place
+        chrome_args = list(self.chrome_args or [])
         if self.chrome_args is None:
             chrome_args.extend(
                 [
@@ -366,5 +367,6 @@ class BrowserWindow(BaseModel):
 
         if self.config.verbose:
             logger.info("Adding cookies to browser...")
-        for cookie in cookies:
-            await self.page.context.add_cookies([cookie.model_dump(exclude_none=True)])  # type: ignore
+        # single round-trip to the browser for the whole cookie jar
+        cookies_payload = [cookie.model_dump(exclude_none=True) for cookie in cookies]
+        await self.page.context.add_cookies(cookies_payload)  # type: ignore
@@ -1,8 +1,11 @@
 from base64 import b64encode
-from typing import Annotated
+from collections.abc import Mapping
+from functools import cached_property
+from typing import Annotated, Any
 
 from PIL import Image
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_serializer
+from typing_extensions import Self, override
 
 from notte_core.browser.snapshot import BrowserSnapshot, SnapshotMetadata
 from notte_core.controller.space import BaseActionSpace
@@ -29,11 +32,34 @@ class Observation(BaseModel):
     ] = None
 
     model_config = {  # type: ignore[reportUnknownMemberType]
-        "json_encoders": {
-            bytes: lambda v: b64encode(v).decode("utf-8") if v else None,
-        }
+        "ignored_types": (cached_property,),
     }
 
+    @override
+    def __setattr__(self, name: str, value: Any) -> None:
+        super().__setattr__(name, value)
+        if name == "screenshot":
+            _ = self.__dict__.pop("screenshot_b64", None)
+
+    @override
+    def model_copy(self, *, update: Mapping[str, Any] | None = None, deep: bool = False) -> Self:
+        copy = super().model_copy(update=update, deep=deep)
+        # `update` bypasses `__setattr__`: drop the encoding copied over from `self`
+        if update is not None and "screenshot" in update:
+            _ = copy.__dict__.pop("screenshot_b64", None)
+        return copy
+
+    @cached_property
+    def screenshot_b64(self) -> str | None:
+        """Base64 encoded screenshot, computed once and reused across JSON dumps"""
+        if not self.screenshot:
+            return None
+        return b64encode(self.screenshot).decode("ascii")
+
+    @field_serializer("screenshot", when_used="json")
+    def serialize_screenshot(self, _screenshot: bytes | None) -> str | None:
+        return self.screenshot_b64
+
     @property
     def clean_url(self) -> str:
         return clean_url(self.metadata.url)
@@ -48,11 +74,9 @@ class Observation(BaseModel):
             return None
         return image_from_bytes(self.screenshot)
 
-    def valid_action_set(self) -> set[str]:
-        valid_action_set: set[str] = set()
-        for action in self.space.actions("all"):
-            valid_action_set.add(action.id)
-        return valid_action_set
+    @property
+    def valid_action_set(self) -> frozenset[str]:
+        return self.space.action_ids
 
     @staticmethod
     def from_snapshot(
@@ -61,7 +85,8 @@ class Observation(BaseModel):
         data: DataSpace | None = None,
         progress: TrajectoryProgress | None = None,
     ) -> "Observation":
-        return Observation(
+        # all arguments are already validated models, no need to validate them again
+        return Observation.model_construct(
             metadata=snapshot.metadata,
             screenshot=snapshot.screenshot,
             space=space,
@@ -13,7 +13,8 @@ class FrozenConfig(BaseModel):
     def _copy_and_validate(self: Self, **kwargs: Any) -> Self:
         # kwargs should be validated before being passed to model_copy
         _ = self.model_validate(kwargs)
-        config = self.model_copy(deep=True, update=kwargs)
+        # configs are frozen: unchanged fields can be shared with the copy instead of deep copied
+        config = self.model_copy(update=kwargs)
         return config
 
     def set_verbose(self: Self) -> Self:
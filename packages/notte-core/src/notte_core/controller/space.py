@@ -3,6 +3,7 @@ import random
 from abc import ABCMeta, abstractmethod
 from collections.abc import Sequence
 from enum import StrEnum
+from functools import cached_property
 from typing import Annotated, Any
 
 from pydantic import BaseModel, Field
@@ -59,6 +60,10 @@ class BaseActionSpace(BaseModel, metaclass=ABCMeta):
     def markdown(self, status: AllActionStatus = "valid", include_browser: bool = True) -> str:
         pass
 
+    @cached_property
+    def action_ids(self) -> frozenset[str]:
+        return frozenset(action.id for action in self.actions("all"))
+
     def sample(
         self,
         status: AllActionStatus = "valid",
@@ -1,60 +1,132 @@
+import asyncio
+import os
+import sys
 from pathlib import Path
 
 import chevron
+from chevron.tokenizer import tokenize
 from litellm import Message
 
 from notte_core.errors.llm import InvalidPromptTemplateError
 
+_VALID_ROLES: frozenset[str] = frozenset({"assistant", "user", "system", "tool", "function"})
+
+# (file name, mtime) of every file of a prompt template
+_PromptVersion = tuple[tuple[str, float], ...]
+
+
+def _read_file(path: str) -> str:
+    with open(path, "r") as file:
+        return file.read()
+
 
 class PromptLibrary:
     def __init__(self, prompts_dir: str | Path) -> None:
         self.prompts_dir: Path = Path(prompts_dir)
         if not self.prompts_dir.exists():
             raise NotADirectoryError(f"Prompts directory not found: {prompts_dir}")
+        # caches are keyed on the name and mtime of every template file so that edited, added
+        # or removed templates are reloaded
+        self._messages_cache: dict[str, tuple[_PromptVersion, list[Message]]] = {}
+        self._token_cache: dict[tuple[str, int], tuple[_PromptVersion, list[tuple[str, str]]]] = {}
+        self._materialized_cache: dict[str, tuple[_PromptVersion, list[dict[str, str]]]] = {}
 
-    def get(self, prompt_id: str) -> list[Message]:
-        prompt_path: Path = self.prompts_dir / prompt_id
-        prompt_files: list[Path] = list(prompt_path.glob("*.md"))
+    def _prompt_files(self, prompt_id: str) -> list[os.DirEntry[str]]:
+        try:
+            with os.scandir(self.prompts_dir / prompt_id) as it:
+                prompt_files = [entry for entry in it if entry.is_file() and entry.name.endswith(".md")]
+        except FileNotFoundError as e:
+            raise FileNotFoundError(f"Prompt template not found: {prompt_id}") from e
         if len(prompt_files) == 0:
             raise FileNotFoundError(f"Prompt template not found: {prompt_id}")
+        return prompt_files
+
+    def _stat(self, prompt_id: str) -> tuple[_PromptVersion, list[os.DirEntry[str]]]:
+        # editing a file in place does not bump the directory mtime: stat every template file
+        prompt_files = self._prompt_files(prompt_id)
+        return tuple(sorted((entry.name, entry.stat().st_mtime) for entry in prompt_files)), prompt_files
+
+    def _parse(self, prompt_id: str, files: list[tuple[str, str]]) -> list[Message]:
         messages: list[Message] = []
-        for prompt_file in prompt_files:
-            with open(prompt_file, "r") as file:
-                content: str = file.read()
-                role: str = prompt_file.name.split(".")[0]
-                if role not in ["assistant", "user", "system", "tool", "function"]:
-                    raise InvalidPromptTemplateError(
-                        prompt_id=prompt_id,
-                        message=(
-                            f"invalid role: {role} in prompt template. "
-                            "Valid roles are: assistant, user, system, tool, function"
-                        ),
-                    )
-                messages.append(Message(role=role, content=content))  # type: ignore
+        for name, content in files:
+            role: str = name.partition(".")[0]
+            if role not in _VALID_ROLES:
+                raise InvalidPromptTemplateError(
+                    prompt_id=prompt_id,
+                    message=(
+                        f"invalid role: {role} in prompt template. Valid roles are: {', '.join(sorted(_VALID_ROLES))}"
+                    ),
+                )
+            messages.append(Message(role=role, content=content))  # type: ignore
         return messages
 
+    def _load(self, prompt_id: str) -> tuple[_PromptVersion, list[Message]]:
+        version, prompt_files = self._stat(prompt_id)
+        cached = self._messages_cache.get(prompt_id)
+        if cached is not None and cached[0] == version:
+            return cached
+
+        files = [(entry.name, _read_file(entry.path)) for entry in prompt_files]
+        self._messages_cache[prompt_id] = (version, self._parse(prompt_id, files))
+        return self._messages_cache[prompt_id]
+
+    def get(self, prompt_id: str) -> list[Message]:
+        _, messages = self._load(prompt_id)
+        return list(messages)
+
+    async def get_async(self, prompt_id: str, timeout: float = 10) -> list[Message]:
+        """Same as `get` but reads the prompt files in parallel without blocking the event loop"""
+        version, prompt_files = await asyncio.to_thread(self._stat, prompt_id)
+        cached = self._messages_cache.get(prompt_id)
+        if cached is not None and cached[0] == version:
+            return list(cached[1])
+
+        contents: list[str] = await asyncio.wait_for(
+            asyncio.gather(*[asyncio.to_thread(_read_file, entry.path) for entry in prompt_files]),
+            timeout=timeout,
+        )
+        files = [(entry.name, content) for entry, content in zip(prompt_files, contents)]
+        messages = self._parse(prompt_id, files)
+        self._messages_cache[prompt_id] = (version, messages)
+        return list(messages)
+
+    def _tokens(self, prompt_id: str, index: int, content: str, version: _PromptVersion) -> list[tuple[str, str]]:
+        # keyed on the message index: a template can have several files with the same role
+        cached = self._token_cache.get((prompt_id, index))
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        tokens: list[tuple[str, str]] = list(tokenize(content))
+        self._token_cache[(prompt_id, index)] = (version, tokens)
+        return tokens
+
     def materialize(self, prompt_id: str, variables: dict[str, str] | None = None) -> list[dict[str, str]]:
         # TODO. You cant pass variables that are not in the prompt template
         # But you can fewer variables than in the prompt template
-        _messages: list[Message] = self.get(prompt_id)
-        messages: list[dict[str, str]] = []
-        for message in _messages:
-            if message.content is None:
-                raise InvalidPromptTemplateError(
-                    prompt_id=prompt_id,
-                    message=f"Message content is none: {message.role}",
-                )
-            messages.append({"role": message.role, "content": message.content})
+        version, _messages = self._load(prompt_id)
+        cached = self._materialized_cache.get(prompt_id)
+        if cached is None or cached[0] != version:
+            for message in _messages:
+                if message.content is None:
+                    raise InvalidPromptTemplateError(
+                        prompt_id=prompt_id,
+                        message=f"Message content is none: {message.role}",
+                    )
+            cached = (version, [{"role": sys.intern(m.role), "content": m.content} for m in _messages])  # type: ignore
+            self._materialized_cache[prompt_id] = cached
+        messages: list[dict[str, str]] = cached[1]
 
         if variables is None:
-            return messages
+            # new list so that callers can append to it, message dicts are shared and must not be mutated
+            return list(messages)
 
         try:
-            materialized_messages: list[dict[str, str]] = []
-            for message in messages:
-                formatted_content: str = chevron.render(message["content"], variables, warn=True)
-                materialized_messages.append({"role": message["role"], "content": formatted_content})
-            return materialized_messages
+            return [
+                {
+                    "role": m["role"],
+                    "content": chevron.render(self._tokens(prompt_id, i, m["content"], version), variables, warn=True),
+                }
+                for i, m in enumerate(messages)
+            ]
         except KeyError as e:
             raise InvalidPromptTemplateError(
                 prompt_id=prompt_id,
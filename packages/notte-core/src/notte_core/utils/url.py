@@ -1,10 +1,12 @@
 import socket
+from functools import lru_cache
 from urllib.parse import urlparse
 
 import requests
 import tldextract
 
 
+@lru_cache(maxsize=4096)
 def clean_url(url: str) -> str:
     # remove anything after ? i.. ?tfs=CBwQARooEgoyMDI0LTEyLTAzagwIAh
     # remove trailing slash
@@ -17,7 +17,7 @@ from notte_core.data.space import DataSpace
 from notte_core.llms.engine import LlmModel
 from notte_core.utils.pydantic_schema import create_model_from_schema
 from notte_core.utils.url import get_root_domain
-from pydantic import BaseModel, Field, field_validator, model_validator
+from pydantic import BaseModel, Field, field_serializer, field_validator, model_validator
 from typing_extensions import TypedDict, override
 
 # ############################################################
@@ -837,18 +837,12 @@ class ObserveResponse(BaseModel):
     data: DataSpace | None
     progress: TrajectoryProgress | None
 
-    model_config = {  # type: ignore[attr-defined]
-        "json_encoders": {
-            bytes: lambda v: b64encode(v).decode("utf-8") if v else None,
-        }
-    }
-
-    @override
-    def model_dump(self, *args: Any, **kwargs: Any) -> dict[str, Any]:
-        data = super().model_dump(*args, **kwargs)
-        if self.screenshot is not None:
-            data["screenshot"] = b64encode(self.screenshot).decode("utf-8")
-        return data
+    @field_serializer("screenshot")
+    def serialize_screenshot(self, screenshot: bytes | None) -> str | None:
+        # encode in all modes so that `model_dump` output is JSON compatible as well
+        if not screenshot:
+            return None
+        return b64encode(screenshot).decode("ascii")
 
     @staticmethod
     def from_obs(
@@ -0,0 +1,106 @@
+import random
+
+import pytest
+from litellm import token_counter
+from notte_agent.common.conversation import CachedMessage, Conversation, _tokenizer_for
+from notte_core.llms.engine import LlmModel
+
+
+def make_history(*messages: tuple[str, int]) -> list[CachedMessage]:
+    return [
+        CachedMessage(message={"role": role, "content": str(i)}, token_count=tokens)  # type: ignore[typeddict-item]
+        for i, (role, tokens) in enumerate(messages)
+    ]
+
+
+def make_conversation(history: list[CachedMessage], max_tokens: int) -> Conversation:
+    conv = Conversation(autosize=True, max_tokens=max_tokens, conservative_factor=1.0)
+    conv.history = list(history)
+    conv._total_tokens = sum(msg.token_count for msg in history)
+    return conv
+
+
+def reference_trim(history: list[CachedMessage], max_tokens: int, new_tokens: int) -> list[CachedMessage]:
+    """Straightforward version of the trimming: pop the oldest non init messages one by one"""
+    init_messages: list[CachedMessage] = []
+    other_messages: list[CachedMessage] = []
+    is_init_msg = True
+    for msg in history:
+        match is_init_msg, msg.message["role"]:
+            case True, "system":
+                init_messages.append(msg)
+            case True, "user":
+                is_init_msg = False
+                init_messages.append(msg)
+            case _, _:
+                other_messages.append(msg)
+    available_tokens = max_tokens - sum(msg.token_count for msg in init_messages) - new_tokens
+    current_tokens = sum(msg.token_count for msg in other_messages)
+    while other_messages and current_tokens > available_tokens:
+        current_tokens -= other_messages.pop(0).token_count
+    return init_messages + other_messages
+
+
+@pytest.mark.parametrize(
+    "history, max_tokens, new_tokens, expected",
+    [
+        # nothing to trim: the history is left untouched
+        (make_history(("system", 5), ("user", 5), ("assistant", 10)), 30, 10, ["0", "1", "2"]),
+        # oldest messages are trimmed first
+        (make_history(("system", 5), ("user", 5), ("assistant", 10), ("user", 10)), 30, 5, ["0", "1", "3"]),
+        # zero token messages are only trimmed if they come before a message that must go
+        (
+            make_history(("system", 5), ("user", 5), ("assistant", 0), ("user", 10), ("assistant", 0)),
+            20,
+            5,
+            ["0", "1", "4"],
+        ),
+        (
+            make_history(("system", 5), ("user", 5), ("assistant", 10), ("user", 0), ("assistant", 0)),
+            15,
+            5,
+            ["0", "1", "3", "4"],
+        ),
+        # budget below the init messages and new content: every non init message goes
+        (make_history(("system", 5), ("user", 5), ("assistant", 1), ("user", 1)), 12, 5, ["0", "1"]),
+        (make_history(("system", 5), ("user", 5)), 5, 5, ["0", "1"]),
+    ],
+)
+def test_trim_history_to_fit(
+    history: list[CachedMessage], max_tokens: int, new_tokens: int, expected: list[str]
+) -> None:
+    conv = make_conversation(history, max_tokens)
+    conv.trim_history_to_fit(new_content_tokens=new_tokens)
+    assert [msg.message["content"] for msg in conv.history] == expected
+    assert conv.total_tokens() == sum(msg.token_count for msg in conv.history)
+
+
+def test_trim_history_to_fit_matches_reference() -> None:
+    rng = random.Random(0)
+    for _ in range(2000):
+        history = make_history(
+            *[(rng.choice(["system", "user", "assistant"]), rng.randint(0, 30)) for _ in range(rng.randint(0, 12))]
+        )
+        max_tokens, new_tokens = rng.randint(1, 200), rng.randint(0, 40)
+        conv = make_conversation(history, max_tokens)
+        fits = conv.total_tokens() + new_tokens <= max_tokens
+
+        conv.trim_history_to_fit(new_content_tokens=new_tokens)
+        expected = history if fits else reference_trim(history, max_tokens, new_tokens)
+        assert conv.history == expected
+        assert conv.total_tokens() == sum(msg.token_count for msg in expected)
+
+
+@pytest.mark.parametrize("model", [LlmModel.openai, LlmModel.gemini])
+def test_count_tokens_matches_litellm(model: str) -> None:
+    # the cached tokenizer relies on the return shape of a private litellm helper
+    tokenizer = _tokenizer_for(model)
+    assert tokenizer is not None and {"type", "tokenizer"} <= tokenizer.keys()
+
+    conv = Conversation(model=model)
+    for message in [
+        {"role": "system", "content": "You are a helpful assistant"},
+        {"role": "user", "content": "Open https://www.example.com and click on the first link " * 20},
+        {"role": "assistant", "content": '{"state": {"memory": "nothing yet"}, "actions": []}'},
+    ]:
+        assert conv.count_tokens(message) == token_counter(model=model, messages=[message])  # type: ignore[arg-type]
@@ -0,0 +1,166 @@
+import json
+from unittest.mock import AsyncMock, MagicMock
+
+import notte_agent.common.conversation as conversation
+import notte_agent.falco.agent as falco
+import pytest
+from notte_agent.common.safe_executor import ExecutionStatus
+from notte_agent.falco.agent import FalcoAgent, FalcoAgentConfig, HistoryType
+from notte_agent.falco.types import StepAgentOutput
+from notte_core.browser.observation import TrajectoryProgress
+from notte_core.controller.actions import ClickAction, GotoAction
+
+from tests.browser.test_observation import make_observation
+
+OUTPUT = StepAgentOutput.model_validate(
+    {
+        "state": {
+            "previous_goal_status": "unknown",
+            "previous_goal_eval": "",
+            "page_summary": "summary",
+            "relevant_interactions": [],
+            "memory": "memory",
+            "next_goal": "goal",
+        },
+        "actions": [{"goto": {"url": "https://www.example.com"}}],
+    }
+)
+
+
+def make_agent(monkeypatch: pytest.MonkeyPatch, **config: object) -> FalcoAgent:
+    # no browser nor tokenizer downloads: the session is mocked and tokens are approximated from the json length
+    monkeypatch.setattr(falco, "NotteSession", MagicMock())
+    monkeypatch.setattr(
+        conversation,
+        "token_counter",
+        lambda model, messages, custom_tokenizer=None: len(json.dumps(messages)) // 4,  # type: ignore[no-untyped-def]
+    )
+    agent = FalcoAgent(config=FalcoAgentConfig.model_validate(config))
+    # the system prompt contains the current time
+    agent.prompt.system = lambda: "system"  # type: ignore[method-assign]
+    agent.session.reset = AsyncMock()  # type: ignore[method-assign]
+    return agent
+
+
+def goto_result(step: int) -> ExecutionStatus[GotoAction, object]:
+    obs = make_observation()
+    obs.screenshot = f"screenshot {step}".encode()
+    obs.progress = TrajectoryProgress(current_step=step, max_steps=10)
+    return ExecutionStatus(input=GotoAction(url=f"https://www.{step}.com"), output=obs, success=True, message="")
+
+
+def failed_result() -> ExecutionStatus[ClickAction, object]:
+    return ExecutionStatus(input=ClickAction(id="B1"), output=None, success=False, message="failed")
+
+
+async def uncached_messages(agent: FalcoAgent, task: str) -> list[object]:
+    cached = list(agent._steps_messages)
+    agent._steps_messages.clear()
+    messages = await agent.get_messages(task)
+    agent._steps_messages[:] = cached
+    return messages  # type: ignore[return-value]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("history_type", [h for h in HistoryType if h is not HistoryType.COMPRESSED])
+@pytest.mark.parametrize("include_screenshot", [False, True])
+async def test_get_messages_is_not_stale_when_last_step_changes(
+    monkeypatch: pytest.MonkeyPatch, history_type: HistoryType, include_screenshot: bool
+) -> None:
+    agent = make_agent(monkeypatch, history_type=history_type, include_screenshot=include_screenshot)
+    for step in range(3):
+        agent.trajectory.add_output(OUTPUT)
+        agent.trajectory.add_step(goto_result(step))
+        assert await agent.get_messages("task") == await uncached_messages(agent, "task")
+
+    # results appended to the last step must be rendered
+    before = await agent.get_messages("task")
+    agent.trajectory.add_step(failed_result())
+    after = await agent.get_messages("task")
+    assert after != before
+    assert after == await uncached_messages(agent, "task")
+
+    agent.trajectory.add_step(goto_result(3))
+    assert await agent.get_messages("task") == await uncached_messages(agent, "task")
+
+
+@pytest.mark.asyncio
+async def test_get_messages_after_reset(monkeypatch: pytest.MonkeyPatch) -> None:
+    agent = make_agent(monkeypatch, history_type=HistoryType.FULL_CONVERSATION)
+    fresh_agent = make_agent(monkeypatch, history_type=HistoryType.FULL_CONVERSATION)
+    for step in range(2):
+        agent.trajectory.add_output(OUTPUT)
+        agent.trajectory.add_step(goto_result(step))
+        _ = await agent.get_messages("task")
+
+    await agent.reset()
+    assert agent._steps_messages == []
+    assert await agent.get_messages("task") == await fresh_agent.get_messages("task")
+
+    for _agent in (agent, fresh_agent):
+        _agent.trajectory.add_output(OUTPUT)
+        _agent.trajectory.add_step(goto_result(5))
+    assert await agent.get_messages("task") == await fresh_agent.get_messages("task")
+
+
+def rerun_result() -> ExecutionStatus[ClickAction, object]:
+    return ExecutionStatus(
+        input=ClickAction(id="X1"),
+        output=None,
+        success=False,
+        message="invalid action id",
+        should_rerun_step_agent=True,
+    )
+
+
+def with_actions(*actions: dict[str, object]) -> StepAgentOutput:
+    return OUTPUT.model_copy(
+        update={"actions": StepAgentOutput.model_validate({**OUTPUT.model_dump(), "actions": list(actions)}).actions}
+    )
+
+
+@pytest.mark.asyncio
+async def test_step_retries_from_the_conversation_when_nothing_ran(monkeypatch: pytest.MonkeyPatch) -> None:
+    agent = make_agent(monkeypatch, max_retry_action_errors=2)
+    agent.predict = AsyncMock(return_value=OUTPUT)  # type: ignore[method-assign]
+    agent.step_executor.execute = AsyncMock(side_effect=[rerun_result(), goto_result(0)])  # type: ignore[method-assign]
+
+    assert await agent.step("task") is None
+    assert agent.predict.await_count == 2
+    first, retry = (call.args[1] for call in agent.predict.await_args_list)
+    # the failed response and the error are appended to the previous messages
+    assert retry[: len(first)] == first
+    assert [m["role"] for m in retry[len(first) :]] == ["assistant", "user"]
+    assert retry[-1]["content"] == "invalid action id"
+    assert [len(step.results) for step in agent.trajectory.steps] == [0, 1]
+
+
+@pytest.mark.asyncio
+async def test_step_rebuilds_messages_when_actions_ran_before_rerun(monkeypatch: pytest.MonkeyPatch) -> None:
+    agent = make_agent(monkeypatch)
+    agent.config = agent.config.model_copy(update={"max_actions_per_step": 2})
+    two_actions = with_actions({"goto": {"url": "https://www.0.com"}}, {"click": {"id": "X1"}})
+    executed = goto_result(0)
+    agent.predict = AsyncMock(side_effect=[two_actions, OUTPUT])  # type: ignore[method-assign]
+    agent.step_executor.execute = AsyncMock(side_effect=[executed, rerun_result(), goto_result(1)])  # type: ignore[method-assign]
+
+    assert await agent.step("task") is None
+    retry = agent.predict.await_args_list[1].args[1]
+
+    # the page changed: the retry is rendered from the trajectory, i.e with the executed action and new observation
+    fresh_agent = make_agent(monkeypatch)
+    fresh_agent.trajectory.add_output(two_actions)
+    fresh_agent.trajectory.add_step(executed)
+    assert retry[:-1] == await fresh_agent.get_messages("task")
+    assert retry[-1]["content"] == "invalid action id"
+
+
+@pytest.mark.asyncio
+async def test_step_gives_up_after_max_retries(monkeypatch: pytest.MonkeyPatch) -> None:
+    agent = make_agent(monkeypatch, max_retry_action_errors=2)
+    agent.predict = AsyncMock(return_value=OUTPUT)  # type: ignore[method-assign]
+    agent.step_executor.execute = AsyncMock(side_effect=lambda _action: rerun_result())  # type: ignore[method-assign]
+
+    assert await agent.step("task") is None
+    assert agent.predict.await_count == 3
+    assert agent.step_executor.execute.await_count == 3
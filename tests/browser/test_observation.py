@@ -0,0 +1,79 @@
+import datetime as dt
+
+from notte_core.actions.base import Action
+from notte_core.actions.space import ActionSpace
+from notte_core.browser.observation import Observation
+from notte_core.browser.snapshot import SnapshotMetadata, ViewportData
+from notte_core.controller.space import EmptyActionSpace
+
+
+def make_observation() -> Observation:
+    return Observation(
+        metadata=SnapshotMetadata(
+            url="https://www.example.com/page/?q=1",
+            title="Example",
+            timestamp=dt.datetime.now(),
+            viewport=ViewportData(
+                scroll_x=0,
+                scroll_y=0,
+                viewport_width=1000,
+                viewport_height=1000,
+                total_width=1000,
+                total_height=1000,
+            ),
+            tabs=[],
+        ),
+        space=EmptyActionSpace(),
+    )
+
+
+def test_valid_action_set_is_recomputed_when_space_changes() -> None:
+    obs = make_observation()
+    assert obs.valid_action_set == frozenset()
+
+    obs.space = ActionSpace(
+        raw_actions=[
+            Action(id="L1", description="Open page", category="Navigation"),
+            Action(id="B1", description="Click button", category="Navigation"),
+        ],
+        description="Example page",
+    )
+    assert obs.valid_action_set == frozenset({"L1", "B1"})
+    assert "valid_action_set" not in obs.model_dump()
+
+
+def test_screenshot_is_base64_encoded_once_in_json() -> None:
+    obs = make_observation()
+    obs.screenshot = b"first"
+    assert obs.model_dump(mode="json")["screenshot"] == "Zmlyc3Q="
+    assert obs.model_dump()["screenshot"] == b"first"
+
+    obs.screenshot = b"second"
+    assert '"screenshot":"c2Vjb25k"' in obs.model_dump_json()
+
+
+def test_clean_url_is_recomputed_when_metadata_changes() -> None:
+    obs = make_observation()
+    assert obs.clean_url == "example.com/page"
+
+    obs.metadata = obs.metadata.model_copy(update={"url": "https://github.com/"})
+    assert obs.clean_url == "github.com"
+
+
+def test_model_copy_does_not_reuse_stale_cached_properties() -> None:
+    obs = make_observation()
+    obs.screenshot = b"first"
+    assert obs.screenshot_b64 == "Zmlyc3Q="
+    assert obs.clean_url == "example.com/page"
+
+    copy = obs.model_copy(
+        update={
+            "screenshot": b"second",
+            "metadata": obs.metadata.model_copy(update={"url": "https://github.com/"}),
+        }
+    )
+    assert copy.model_dump(mode="json")["screenshot"] == "c2Vjb25k"
+    assert copy.clean_url == "github.com"
+    # the original keeps its own cached values
+    assert obs.screenshot_b64 == "Zmlyc3Q="
+    assert obs.clean_url == "example.com/page"
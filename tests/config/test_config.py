@@ -36,3 +36,11 @@ def test_set_deep_verbose_subclass():
     updated_config = config.set_deep_verbose()
     assert updated_config.verbose is True
     assert updated_config.config.verbose is True
+
+
+def test_copy_and_validate_shares_unchanged_fields():
+    config = SubSubConfig()
+    updated_config = config._copy_and_validate(hello="notte")  # pyright: ignore[reportPrivateUsage]
+    assert updated_config.hello == "notte"
+    assert config.hello == "world"
+    assert updated_config.config is config.config
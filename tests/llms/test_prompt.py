@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 
 import pytest
@@ -66,3 +67,64 @@ def test_materialize_prompt(temp_prompts_dir: Path) -> None:
     # TODO: Andrea check this
     # with pytest.raises(ValueError, match="Missing required variable"):
     #     prompt_lib.materialize("test-prompt", {"wrong_var": "value"})
+
+
+def test_materialize_reuses_cached_tokens(temp_prompts_dir: Path) -> None:
+    prompt_lib: PromptLibrary = PromptLibrary(temp_prompts_dir)
+
+    first = prompt_lib.materialize("test-prompt", {"name": "John"})
+    tokens = {key: cached[1] for key, cached in prompt_lib._token_cache.items()}
+    second = prompt_lib.materialize("test-prompt", {"name": "Jane"})
+
+    assert len(tokens) == 3
+    assert all(prompt_lib._token_cache[key][1] is value for key, value in tokens.items())
+    assert next(msg for msg in first if msg["role"] == "user")["content"] == "Hello John!"
+    assert next(msg for msg in second if msg["role"] == "user")["content"] == "Hello Jane!"
+
+
+def test_materialize_reloads_edited_template(temp_prompts_dir: Path) -> None:
+    prompt_lib: PromptLibrary = PromptLibrary(temp_prompts_dir)
+    _ = prompt_lib.materialize("test-prompt", {"name": "John"})
+
+    # edit the file in place: the directory mtime is left untouched
+    user_file = temp_prompts_dir / "test-prompt" / "user.md"
+    dir_mtime = (temp_prompts_dir / "test-prompt").stat().st_mtime
+    _ = user_file.write_text("Goodbye {{name}}!")
+    os.utime(user_file, (user_file.stat().st_atime, user_file.stat().st_mtime + 10))
+    os.utime(temp_prompts_dir / "test-prompt", (dir_mtime, dir_mtime))
+
+    messages = prompt_lib.materialize("test-prompt", {"name": "John"})
+    assert next(msg for msg in messages if msg["role"] == "user")["content"] == "Goodbye John!"
+
+
+def test_materialize_reloads_removed_template(temp_prompts_dir: Path) -> None:
+    # removing a file older than the remaining ones does not change their latest mtime
+    assistant_file = temp_prompts_dir / "test-prompt" / "assistant.md"
+    os.utime(assistant_file, (0, 0))
+    prompt_lib: PromptLibrary = PromptLibrary(temp_prompts_dir)
+    assert len(prompt_lib.materialize("test-prompt", {"name": "John"})) == 3
+
+    assistant_file.unlink()
+    messages = prompt_lib.materialize("test-prompt", {"name": "John"})
+    assert sorted(msg["role"] for msg in messages) == ["system", "user"]
+
+
+def test_materialize_renders_each_file_of_a_role(temp_prompts_dir: Path) -> None:
+    _ = (temp_prompts_dir / "test-prompt" / "user.1.md").write_text("Bye {{name}}!")
+    prompt_lib: PromptLibrary = PromptLibrary(temp_prompts_dir)
+
+    for name in ["John", "Jane"]:
+        messages = prompt_lib.materialize("test-prompt", {"name": name})
+        assert sorted(msg["content"] for msg in messages if msg["role"] == "user") == [f"Bye {name}!", f"Hello {name}!"]
+
+
+@pytest.mark.asyncio
+async def test_get_prompt_async(temp_prompts_dir: Path) -> None:
+    prompt_lib: PromptLibrary = PromptLibrary(temp_prompts_dir)
+
+    messages = await prompt_lib.get_async("test-prompt")
+    assert sorted(msg.role for msg in messages) == ["assistant", "system", "user"]
+    assert sorted(msg.content for msg in messages) == sorted(msg.content for msg in prompt_lib.get("test-prompt"))
+
+    with pytest.raises(FileNotFoundError):
+        _ = await prompt_lib.get_async("non-existent-prompt")